@@ -2,6 +2,7 @@ from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
 
 from ..utils import resources_path
+from .catalog import EdigeoCatalog
 from .export import EdigeoExport
 from .inspect import EdigeoInspect
 
@@ -16,6 +17,7 @@ class Provider(QgsProcessingProvider):
     def loadAlgorithms(self):
         self.addAlgorithm(EdigeoInspect())
         self.addAlgorithm(EdigeoExport())
+        self.addAlgorithm(EdigeoCatalog())
 
     def icon(self) -> QIcon:
         return QIcon(str(resources_path("icon.png")))
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tarfile
+import time
+
+from hashlib import blake2b
+from pathlib import Path
+from typing import (
+    Any,
+    Optional,
+)
+
+from edigeo.extras import read_from_archive
+from qgis.core import (
+    QgsProcessingException,
+    QgsProcessingFeedback,
+)
+
+EXCHANGES_FOLDER = "exchanges"
+
+# Exchanges used within this delay (in seconds) are never evicted
+# since they may still be parsed by a running job
+EVICTION_DELAY = 3600
+
+ARCHIVE_SUFFIXES = (".tar.bz2", ".tbz2")
+
+
+def is_archive(file: Path) -> bool:
+    return file.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_key(file: Path) -> str:
+    """Key computed from the archive content and modification time"""
+    h = blake2b(digest_size=16)
+    with file.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return f"{h.hexdigest()}-{file.stat().st_mtime_ns}"
+
+
+def find_thf(folder: Path) -> Path:
+    for path in sorted(folder.rglob("*")):
+        if path.suffix.upper() == ".THF" and path.is_file():
+            return path
+    raise QgsProcessingException(f"Aucun fichier THF dans l'archive {folder.name}")
+
+
+def folder_size(folder: Path) -> int:
+    return sum(p.stat().st_size for p in folder.rglob("*") if p.is_file())
+
+
+class ExchangeCache:
+    """Local cache of decompressed EDIGEO exchanges
+
+    Archives are decompressed in a single streaming pass
+    into a folder keyed by the archive hash and modification time.
+    Least recently used exchanges are evicted when the total
+    size exceeds `max_size` (in bytes). Exchanges used within
+    `EVICTION_DELAY` are kept, so the cache may temporarily
+    exceed `max_size`.
+    """
+
+    def __init__(self, folder: Path, max_size: int):
+        self._folder = folder
+        self._max_size = max_size
+        self._folder.mkdir(exist_ok=True)
+
+    @classmethod
+    def open(cls, folder: Optional[str | Path], max_size_mo: int) -> Optional["ExchangeCache"]:
+        """Open the cache in `folder`, return None if no folder is given"""
+        if not folder:
+            return None
+        return cls(Path(folder).joinpath(EXCHANGES_FOLDER), max_size_mo * 1024 * 1024)
+
+    def get(self, file: Path, feedback: QgsProcessingFeedback) -> Path:
+        """Return the path of the THF file of the decompressed archive"""
+        exchange = self._folder.joinpath(archive_key(file))
+        if self._touch(exchange):
+            feedback.pushInfo(f"{file.name}: archive trouvée dans le cache")
+        else:
+            tmp = self._folder.joinpath(f".{exchange.name}-{os.getpid()}")
+            start = time.perf_counter()
+            try:
+                with tarfile.open(file, "r|bz2") as tar:
+                    tar.extractall(tmp, filter="data")
+                try:
+                    tmp.rename(exchange)
+                except OSError:
+                    # Concurrently extracted by another job
+                    if not exchange.is_dir():
+                        raise
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            self._touch(exchange)
+            feedback.pushInfo(f"{file.name}: décompression en {time.perf_counter() - start:.2f}s")
+            self._evict(exchange)
+
+        return find_thf(exchange)
+
+    @staticmethod
+    def _touch(exchange: Path) -> bool:
+        """Mark the exchange as recently used, return False if it does not exist"""
+        try:
+            os.utime(exchange)
+        except FileNotFoundError:
+            return False
+        return exchange.is_dir()
+
+    def _evict(self, keep: Path):
+        exchanges = [p for p in self._folder.iterdir() if p.is_dir() and not p.name.startswith(".")]
+        sizes = {p: folder_size(p) for p in exchanges}
+        total = sum(sizes.values())
+        for path in sorted(exchanges, key=lambda p: p.stat().st_mtime):
+            if total <= self._max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                # Check again: the exchange may have been used meanwhile
+                if time.time() - path.stat().st_mtime < EVICTION_DELAY:
+                    continue
+            except FileNotFoundError:
+                # Evicted by another job
+                total -= sizes[path]
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+
+
+def open_exchange(
+    file: Path,
+    cache: Optional[ExchangeCache],
+    feedback: QgsProcessingFeedback,
+) -> Any:
+    """Return an EDIGEO parser for an archive or a THF file"""
+    if cache and is_archive(file):
+        return read_from_archive(cache.get(file, feedback))
+
+    start = time.perf_counter()
+    parser = read_from_archive(file)
+    if is_archive(file):
+        feedback.pushInfo(f"{file.name}: lecture de l'archive en {time.perf_counter() - start:.2f}s")
+    return parser
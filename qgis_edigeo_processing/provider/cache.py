@@ -0,0 +1,133 @@
+import json
+import sqlite3
+import time
+
+from array import array
+from hashlib import blake2b
+from itertools import chain
+from pathlib import Path
+from typing import (
+    Optional,
+    Sequence,
+)
+
+from edigeo.types import Ring
+
+# Bump this when the validation or repair procedures change
+# so that stale results are not reused
+CACHE_VERSION = b"1"
+
+CACHE_FILENAME = "validation.sqlite"
+
+# Default maximum size of the cache in Mo
+DEFAULT_CACHE_SIZE = 512
+
+
+def rings_key(rings: Sequence[Ring]) -> bytes:
+    """Key computed from the raw ring coordinates"""
+    h = blake2b(b"rings:" + CACHE_VERSION, digest_size=20)
+    for ring, outer in rings:
+        h.update(b"\x01" if outer else b"\x00")
+        h.update(len(ring).to_bytes(4, "little"))
+        h.update(array("d", chain.from_iterable(ring)).tobytes())
+    return h.digest()
+
+
+def wkb_key(wkb: bytes) -> bytes:
+    """Key computed from the raw geometry"""
+    h = blake2b(b"wkb:" + CACHE_VERSION, digest_size=20)
+    h.update(wkb)
+    return h.digest()
+
+
+def dump_rings(rings: Sequence[Ring]) -> bytes:
+    return json.dumps(rings).encode()
+
+
+def load_rings(data: bytes) -> Sequence[Ring]:
+    return [([(x, y) for x, y in ring], outer) for ring, outer in json.loads(data)]
+
+
+class ValidationCache:
+    """Persistent cache for validation results
+
+    Results are stored in a SQLite database and evicted
+    by least recent access when the total size of the stored
+    values exceeds `max_size` (in bytes).
+    """
+
+    def __init__(self, path: Path, max_size: int):
+        self._max_size = max_size
+        self._conn = sqlite3.connect(str(path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key BLOB PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " atime REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_atime ON results(atime)")
+        self._conn.commit()
+        self._hits: list[bytes] = []
+        self._added: list[tuple[bytes, bytes, int, float]] = []
+
+    @classmethod
+    def open(cls, folder: Optional[str | Path], max_size_mo: int) -> Optional["ValidationCache"]:
+        """Open the cache in `folder`, return None if no folder is given"""
+        if not folder:
+            return None
+        return cls(Path(folder).joinpath(CACHE_FILENAME), max_size_mo * 1024 * 1024)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._hits.append(key)
+        return row[0]
+
+    def put(self, key: bytes, value: bytes):
+        self._added.append((key, value, len(value), time.time()))
+
+    def get_validity(self, key: bytes) -> Optional[bool]:
+        value = self.get(key)
+        return None if value is None else value == b"\x01"
+
+    def put_validity(self, key: bytes, valid: bool):
+        self.put(key, b"\x01" if valid else b"\x00")
+
+    def close(self):
+        """Store pending results and evict least recently used entries"""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, value, size, atime) VALUES (?, ?, ?, ?)",
+                self._added,
+            )
+            self._conn.executemany(
+                "UPDATE results SET atime = ? WHERE key = ?",
+                ((now, key) for key in self._hits),
+            )
+            self._evict()
+        self._conn.close()
+        self._added.clear()
+        self._hits.clear()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if total <= self._max_size:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY atime"):
+            if total <= self._max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def __enter__(self) -> "ValidationCache":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,200 @@
+import json
+
+from pathlib import Path
+from textwrap import dedent
+from typing import (
+    Any,
+    Optional,
+)
+
+import edigeo
+
+from edigeo.report import create_report
+from qgis.core import (
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+)
+
+from .. import utils
+from .archive import ExchangeCache, is_archive, open_exchange
+from .cache import DEFAULT_CACHE_SIZE
+
+
+def is_exchange(path: Path) -> bool:
+    return path.is_file() and (is_archive(path) or path.suffix.upper() == ".THF")
+
+
+def exchange_size(path: Path) -> int:
+    """Size of the exchange
+
+    For a THF file, this is the size of all the files
+    of the exchange folder.
+    """
+    if is_archive(path):
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.parent.iterdir() if p.is_file())
+
+
+class EdigeoCatalog(QgsProcessingAlgorithm):
+    INPUT_FOLDER = "folder"
+    CACHE_FOLDER = "cache"
+    CACHE_SIZE = "cache_size"
+
+    OUTPUT_FILE = "output"
+
+    def initAlgorithm(self, config: Optional[dict] = None):
+        # Input folder
+        self._add_parameter(
+            QgsProcessingParameterFile(
+                self.INPUT_FOLDER,
+                "Edigeo folder",
+                behavior=QgsProcessingParameterFile.Folder,
+            ),
+            "Dossier contenant les archives TAR ou fichiers .THF",
+        )
+
+        # Archive cache
+        self._add_parameter(
+            QgsProcessingParameterFile(
+                self.CACHE_FOLDER,
+                "Cache folder",
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True,
+            ),
+            "Dossier des caches persistants (archives décompressées)",
+        )
+
+        cache_size = QgsProcessingParameterNumber(
+            self.CACHE_SIZE,
+            "Cache size (Mo)",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=1,
+            defaultValue=DEFAULT_CACHE_SIZE,
+        )
+        cache_size.setFlags(cache_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self._add_parameter(cache_size, "Taille maximale du cache en Mo")
+
+        # Output catalog
+        self._add_parameter(
+            QgsProcessingParameterFileDestination(
+                self.OUTPUT_FILE,
+                "Catalog",
+                fileFilter="JSON (*.json)",
+            ),
+            "Fichier JSON du catalogue",
+        )
+
+    def _add_parameter(
+        self,
+        parameter: QgsProcessingParameterDefinition,
+        help_str: str,
+    ):
+        parameter.setHelp(dedent(help_str))
+        self.addParameter(parameter)
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        folder = Path(self.parameterAsFile(parameters, self.INPUT_FOLDER, context))
+        if not folder.is_dir():
+            raise QgsProcessingException(f"Repertoire invalide {folder}")
+
+        output = Path(self.parameterAsFileOutput(parameters, self.OUTPUT_FILE, context))
+
+        cache = ExchangeCache.open(
+            self.parameterAsFile(parameters, self.CACHE_FOLDER, context),
+            self.parameterAsInt(parameters, self.CACHE_SIZE, context),
+        )
+
+        files = sorted(p for p in folder.rglob("*") if is_exchange(p))
+
+        catalog = []
+        for i, file in enumerate(files):
+            if feedback.isCanceled():
+                break
+            try:
+                catalog.append(self._catalog_entry(folder, file, cache, feedback))
+            except Exception as err:
+                feedback.reportError(f"{file.name}: {err}")
+                catalog.append(
+                    {
+                        "file": str(file.relative_to(folder)),
+                        "error": str(err),
+                    }
+                )
+            feedback.setProgress(100 * (i + 1) / len(files))
+
+        utils.log(f"Writing EDIGEO catalog to {output}")
+
+        with output.open("w") as out:
+            json.dump(catalog, out, separators=(",", ":"))
+
+        return {
+            self.OUTPUT_FILE: str(output),
+        }
+
+    def _catalog_entry(
+        self,
+        folder: Path,
+        file: Path,
+        cache: Optional[ExchangeCache],
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        parser = open_exchange(file, cache, feedback)
+
+        # Collect metadata only: features are not serialized
+        # nor validated
+        report = create_report(parser, edigeo.ValidationMode.Trust, lambda *args: None)
+
+        layers = [{"name": layer.name, "count": len(layer)} for layer in parser.layers() if len(layer) > 0]
+
+        return {
+            "file": str(file.relative_to(folder)),
+            "size": exchange_size(file),
+            "name": report["name"],
+            "author": report["author"],
+            "edigeo_version": report["edigeo_version"],
+            "edigeo_version_date": report["edigeo_version_date"],
+            "crs": report["crs"],
+            "extent": list(report["extent"]),
+            "features": sum(layer["count"] for layer in layers),
+            "layers": layers,
+        }
+
+    def name(self) -> str:
+        return "catalog"
+
+    def displayName(self) -> str:
+        return "catalog"
+
+    def createInstance(self) -> "EdigeoCatalog":
+        return EdigeoCatalog()
+
+    def shortHelpString(self) -> str:
+        parameters = "\n".join(f"{p.name()}: {p.help()}" for p in self.parameterDefinitions())
+        returns = "\n".join(f"{o.name()}: {o.description()}" for o in self.outputDefinitions())
+        return dedent(
+            f"""Catalogue les échanges EDIGEO d'un dossier sans valider les géométries.
+
+                Retourne pour chaque échange les métadonnées, les couches
+                et le nombre d'objets au format JSON.
+
+                Inputs:
+                    {parameters}
+
+                Outputs:
+                    {returns}
+            """
+        )
+
+    def shortDescription(self) -> str:
+        return "Catalogue les échanges EDIGEO d'un dossier"
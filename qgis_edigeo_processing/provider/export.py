@@ -1,6 +1,8 @@
+import time
 import traceback
 
 from functools import cache
+from io import BytesIO
 from pathlib import Path
 from textwrap import dedent
 from typing import (
@@ -12,7 +14,6 @@ from typing import (
 from edigeo import Feature as EdigeoFeature
 from edigeo import Layer as EdigeoLayer
 from edigeo import ValidationMode, WriteOptions
-from edigeo.extras import read_from_archive
 from edigeo.types import Ring
 from qgis.core import (
     Qgis,
@@ -24,17 +25,41 @@ from qgis.core import (
     QgsProcessingFeedback,
     QgsProcessingOutputMultipleLayers,
     QgsProcessingParameterBoolean,
+    QgsProcessingParameterCrs,
     QgsProcessingParameterDefinition,
     QgsProcessingParameterFile,
     QgsProcessingParameterFolderDestination,
+    QgsProcessingParameterNumber,
     QgsProcessingUtils,
 )
 
+from .archive import ExchangeCache, open_exchange
+from .cache import (
+    DEFAULT_CACHE_SIZE,
+    ValidationCache,
+    dump_rings,
+    load_rings,
+    rings_key,
+)
+from .layers import (
+    flatgeobuf_source,
+    memory_layer,
+    read_features,
+    transform_features,
+    write_csv,
+    write_flatgeobuf,
+)
+
 
 class EdigeoExport(QgsProcessingAlgorithm):
     INPUT_FILE = "file"
     OUTPUT_FOLDER = "folder"
     ADD_TO_PROJECT = "add"
+    MEMORY_LAYERS = "memory"
+    TARGET_CRS = "crs"
+    ATTRIBUTES_ONLY = "attributes"
+    CACHE_FOLDER = "cache"
+    CACHE_SIZE = "cache_size"
 
     OUTPUT_LAYERS = "layers"
 
@@ -50,12 +75,15 @@ class EdigeoExport(QgsProcessingAlgorithm):
         )
 
         # Output folder
+        output_folder = QgsProcessingParameterFolderDestination(
+            self.OUTPUT_FOLDER,
+            "Dossier de destination",
+            optional=True,
+        )
+        output_folder.setCreateByDefault(False)
         self._add_parameter(
-            QgsProcessingParameterFolderDestination(
-                self.OUTPUT_FOLDER,
-                "Dossier de destination",
-            ),
-            "Dossier d'export des fichierl",
+            output_folder,
+            "Dossier d'export des fichiers (optionnel pour les couches en mémoire)",
         )
 
         # Add to project ?
@@ -67,6 +95,57 @@ class EdigeoExport(QgsProcessingAlgorithm):
             "Add layers to current project",
         )
 
+        # Load layers in memory ?
+        self._add_parameter(
+            QgsProcessingParameterBoolean(
+                self.MEMORY_LAYERS,
+                "Load layers in memory",
+                defaultValue=False,
+            ),
+            "Construit des couches en mémoire, sans relire les fichiers depuis le disque",
+        )
+
+        # Target CRS
+        self._add_parameter(
+            QgsProcessingParameterCrs(
+                self.TARGET_CRS,
+                "Target CRS",
+                optional=True,
+            ),
+            "Système de coordonnées cible, les couches sont reprojetées à l'export",
+        )
+
+        # Attributes only ?
+        self._add_parameter(
+            QgsProcessingParameterBoolean(
+                self.ATTRIBUTES_ONLY,
+                "Export attributes only",
+                defaultValue=False,
+            ),
+            "Exporte uniquement les attributs au format CSV, sans valider les géométries",
+        )
+
+        # Validation cache
+        self._add_parameter(
+            QgsProcessingParameterFile(
+                self.CACHE_FOLDER,
+                "Cache folder",
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True,
+            ),
+            "Dossier des caches persistants (résultats de validation, archives décompressées)",
+        )
+
+        cache_size = QgsProcessingParameterNumber(
+            self.CACHE_SIZE,
+            "Cache size (Mo)",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=1,
+            defaultValue=DEFAULT_CACHE_SIZE,
+        )
+        cache_size.setFlags(cache_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self._add_parameter(cache_size, "Taille maximale de chaque cache en Mo")
+
         # Output Layers
         self.addOutput(
             QgsProcessingOutputMultipleLayers(
@@ -93,13 +172,43 @@ class EdigeoExport(QgsProcessingAlgorithm):
         if not file.is_file():
             raise QgsProcessingException(f"Fichier invalide {file}")
 
-        output_dir = Path(self.parameterAsString(parameters, self.OUTPUT_FOLDER, context))
-        if not output_dir.is_dir():
-            raise QgsProcessingAlgorithm(f"Repertoire invalide {output_dir}")
+        attributes_only = self.parameterAsBool(parameters, self.ATTRIBUTES_ONLY, context)
+        memory_layers = self.parameterAsBool(parameters, self.MEMORY_LAYERS, context)
+
+        output_folder = self.parameterAsString(parameters, self.OUTPUT_FOLDER, context)
+        output_dir = Path(output_folder) if output_folder else None
+        if output_dir is None and not memory_layers:
+            raise QgsProcessingException("Dossier de destination requis")
+        if output_dir is not None and not output_dir.is_dir():
+            raise QgsProcessingException(f"Repertoire invalide {output_dir}")
 
         add_to_project = self.parameterAsBool(parameters, self.ADD_TO_PROJECT, context)
 
-        parser = read_from_archive(file)
+        target_crs = self.parameterAsCrs(parameters, self.TARGET_CRS, context)
+        if not target_crs.isValid():
+            target_crs = None
+
+        if attributes_only and memory_layers:
+            raise QgsProcessingException(
+                "L'export des attributs seuls est incompatible avec les couches en mémoire"
+            )
+        if attributes_only and target_crs:
+            raise QgsProcessingException("L'export des attributs seuls est incompatible avec la reprojection")
+
+        cache_folder = self.parameterAsFile(parameters, self.CACHE_FOLDER, context)
+        cache_size = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        validation_cache = ValidationCache.open(cache_folder, cache_size)
+
+        parser = open_exchange(file, ExchangeCache.open(cache_folder, cache_size), feedback)
+
+        # Number of failed ring operations: repairs that reported
+        # an error are lossy and must not be cached
+        repair_errors = 0
+
+        def report_repair_error(msg: str):
+            nonlocal repair_errors
+            repair_errors += 1
+            feedback.reportError(msg)
 
         def validate(
             feat: EdigeoFeature,
@@ -123,7 +232,7 @@ class EdigeoExport(QgsProcessingAlgorithm):
                         Qgis.WkbType.Polygon,
                     )
                     if result != Qgis.GeometryOperationResult.Success:
-                        feedback.reportError(
+                        report_repair_error(
                             f"{feat.id}/{face}: Geometry operation "
                             f"failed with error {result}"
                         )
@@ -148,7 +257,7 @@ class EdigeoExport(QgsProcessingAlgorithm):
                             result = root.addRing(g.asPolygon()[0])
                             if result != Qgis.GeometryOperationResult.Success:
                                 # hum, it intersects a root but is not a child, drop it
-                                feedback.reportError(f"Geometry operation failed with error {result}")
+                                report_repair_error(f"Geometry operation failed with error {result}")
                             break
                     else:
                         # Add as a root
@@ -166,6 +275,22 @@ class EdigeoExport(QgsProcessingAlgorithm):
                 traceback.print_exc()
                 raise
 
+        def cached_validate(
+            feat: EdigeoFeature,
+            rings: Sequence[Ring],
+            face: str,
+        ) -> Sequence[Ring]:
+            assert validation_cache is not None
+            key = rings_key(rings)
+            data = validation_cache.get(key)
+            if data is not None:
+                return load_rings(data)
+            errors = repair_errors
+            rings = validate(feat, rings, face)
+            if repair_errors == errors:
+                validation_cache.put(key, dump_rings(rings))
+            return rings
+
         output_layers = []
 
         validation_mode = ValidationMode.Trust
@@ -173,24 +298,112 @@ class EdigeoExport(QgsProcessingAlgorithm):
         options = WriteOptions()
         options.mode = validation_mode
 
-        def write_layer(layer: EdigeoLayer) -> str:
-            out = output_dir.joinpath(layer.name).with_suffix(".fgb")
-            with out.open("wb") as writer:
-                layer.write_flatgeobuf(writer, options, validate=validate)
+        validate_rings = cached_validate if validation_cache else validate
 
+        def add_layer(layer: EdigeoLayer, out: str) -> str:
             if add_to_project:
                 context.addLayerToLoadOnCompletion(
-                    str(out),
+                    out,
                     context.LayerDetails(
                         layer.name,
                         context.project(),
-                        "FOOBAR",
+                        self.OUTPUT_LAYERS,
                         QgsProcessingUtils.LayerHint.Vector,
                     ),
                 )
-            return str(out)
+            return out
+
+        def write_attributes(layer: EdigeoLayer) -> str:
+            assert output_dir is not None
+
+            # EDIGEO identifiers in write order: all the faces
+            # of an object are passed in a row
+            ids: list[str] = []
+
+            def keep_rings(
+                feat: EdigeoFeature,
+                rings: Sequence[Ring],
+                face: str,
+            ) -> Sequence[Ring]:
+                if not ids or ids[-1] != feat.id:
+                    ids.append(feat.id)
+                return rings
 
-        output_layers = [write_layer(layer) for layer in parser.layers() if len(layer) > 0]
+            buffer = BytesIO()
+            layer.write_flatgeobuf(
+                buffer,
+                options,
+                validate=keep_rings,
+            )
+            path = output_dir.joinpath(layer.name).with_suffix(".csv")
+            with flatgeobuf_source(layer.name, buffer.getvalue()) as source:
+                if len(ids) != source.featureCount():
+                    # Rings are only validated for surface objects
+                    ids = [feat.id for feat in layer]
+                write_csv(source, ids, path)
+            return add_layer(layer, str(path))
+
+        def write_layer(layer: EdigeoLayer) -> str:
+            path = output_dir.joinpath(layer.name).with_suffix(".fgb") if output_dir else None
+            if not (memory_layers or target_crs):
+                assert path is not None
+                with path.open("wb") as writer:
+                    layer.write_flatgeobuf(
+                        writer,
+                        options,
+                        validate=validate_rings,
+                    )
+                return add_layer(layer, str(path))
+
+            buffer = BytesIO()
+            layer.write_flatgeobuf(
+                buffer,
+                options,
+                validate=validate_rings,
+            )
+            data = buffer.getvalue()
+
+            with flatgeobuf_source(layer.name, data) as source:
+                crs = source.crs()
+                if target_crs and not crs.isValid():
+                    raise QgsProcessingException(f"{layer.name}: système de coordonnées source inconnu")
+
+                if path and not target_crs:
+                    path.write_bytes(data)
+                    out = str(path)
+
+                start = time.perf_counter()
+                features = read_features(source)
+                timings = [f"lecture {time.perf_counter() - start:.3f}s"]
+
+                if target_crs:
+                    # Time the coordinate transform alone
+                    start = time.perf_counter()
+                    transform_features(features, crs, target_crs, context.transformContext())
+                    timings.append(f"reprojection {time.perf_counter() - start:.3f}s")
+                    crs = target_crs
+
+                    if path:
+                        start = time.perf_counter()
+                        write_flatgeobuf(source, features, path, crs, context.transformContext())
+                        timings.append(f"écriture {time.perf_counter() - start:.3f}s")
+                        out = str(path)
+
+                    feedback.pushInfo(f"{layer.name}: {', '.join(timings)}")
+
+                if memory_layers:
+                    vl = memory_layer(source, features, crs)
+                    context.temporaryLayerStore().addMapLayer(vl)
+                    out = vl.id()
+
+            return add_layer(layer, out)
+
+        try:
+            write = write_attributes if attributes_only else write_layer
+            output_layers = [write(layer) for layer in parser.layers() if len(layer) > 0]
+        finally:
+            if validation_cache:
+                validation_cache.close()
 
         return {
             self.OUTPUT_LAYERS: output_layers,
@@ -211,6 +424,8 @@ class EdigeoExport(QgsProcessingAlgorithm):
         return dedent(
             f"""Exporte les couches EDIGEO au format FlatGeoBuf .
 
+                Avec l'option 'attributes', seuls les attributs sont exportés au format CSV.
+
                 Inputs:
                     {parameters}
 
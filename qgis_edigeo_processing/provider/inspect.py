@@ -8,10 +8,8 @@ from typing import (
 
 import edigeo
 
-from edigeo.extras import read_from_archive
 from edigeo.report import ValidationError, create_report
 from qgis.core import (
-    QgsGeometry,
     QgsProcessingAlgorithm,
     QgsProcessingContext,
     QgsProcessingException,
@@ -20,15 +18,22 @@ from qgis.core import (
     QgsProcessingParameterDefinition,
     QgsProcessingParameterFile,
     QgsProcessingParameterFolderDestination,
+    QgsProcessingParameterNumber,
 )
 
 from .. import utils
+from .archive import ExchangeCache, open_exchange
+from .cache import DEFAULT_CACHE_SIZE, ValidationCache
 from .json2html import json2html
+from .validity import GeosValidator, invalid_error
 
 
 class EdigeoInspect(QgsProcessingAlgorithm):
     INPUT_FILE = "file"
     OUTPUT_FOLDER = "folder"
+    WORKERS = "workers"
+    CACHE_FOLDER = "cache"
+    CACHE_SIZE = "cache_size"
 
     OUTPUT_HTML = "html"
 
@@ -52,6 +57,41 @@ class EdigeoInspect(QgsProcessingAlgorithm):
             "Dossier d'export des fichier",
         )
 
+        # Number of GEOS validation workers
+        workers = QgsProcessingParameterNumber(
+            self.WORKERS,
+            "Validation workers",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=0,
+        )
+        workers.setFlags(workers.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self._add_parameter(
+            workers,
+            "Nombre de threads pour la validation GEOS (0: validation séquentielle)",
+        )
+
+        # Validation cache
+        self._add_parameter(
+            QgsProcessingParameterFile(
+                self.CACHE_FOLDER,
+                "Cache folder",
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True,
+            ),
+            "Dossier des caches persistants (résultats de validation, archives décompressées)",
+        )
+
+        cache_size = QgsProcessingParameterNumber(
+            self.CACHE_SIZE,
+            "Cache size (Mo)",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=1,
+            defaultValue=DEFAULT_CACHE_SIZE,
+        )
+        cache_size.setFlags(cache_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self._add_parameter(cache_size, "Taille maximale de chaque cache en Mo")
+
         # Output HTML
         self.addOutput(
             QgsProcessingOutputHtml(
@@ -83,9 +123,27 @@ class EdigeoInspect(QgsProcessingAlgorithm):
         if not output_dir.is_dir():
             raise QgsProcessingAlgorithm(f"Repertoire invalide {output_dir}")
 
-        parser = read_from_archive(file)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        cache_folder = self.parameterAsFile(parameters, self.CACHE_FOLDER, context)
+        cache_size = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        validation_cache = ValidationCache.open(cache_folder, cache_size)
+
+        parser = open_exchange(file, ExchangeCache.open(cache_folder, cache_size), feedback)
 
         writer = BytesIO()
+        validator = GeosValidator(workers, cache=validation_cache)
+
+        def prepare(
+            feat: edigeo.Feature,
+            mode: edigeo.ValidationMode,
+            errors: list[ValidationError],
+        ):
+            # Preliminary pass: submit geometries to the validation workers
+            writer.seek(0)
+            writer.truncate(0)
+
+            if feat.write_wkb_geom(writer, mode=mode, inspect=lambda *args: None):
+                validator.submit(writer.getvalue())
 
         def inspect(
             feat: edigeo.Feature,
@@ -108,19 +166,18 @@ class EdigeoInspect(QgsProcessingAlgorithm):
                 ),
             ):
                 # Check geometry validity (i.e overlapping polygons)
-                geom = QgsGeometry()
-                geom.fromWkb(writer.getvalue())
-                if not geom.isGeosValid():
-                    errors.append(
-                        {
-                            "rid": feat.id,
-                            "face": "",
-                            "status": "Invalid",
-                            "arc": "",
-                        }
-                    )
-
-        report = create_report(parser, edigeo.ValidationMode.Trust, inspect)
+                if not validator.is_valid(writer.getvalue()):
+                    errors.append(invalid_error(feat.id))
+
+        try:
+            with validator:
+                if validator.parallel:
+                    create_report(parser, edigeo.ValidationMode.Trust, prepare)
+                    validator.wait()
+                report = create_report(parser, edigeo.ValidationMode.Trust, inspect)
+        finally:
+            if validation_cache:
+                validation_cache.close()
 
         html_output = Path(output_dir).joinpath(f"{file.stem}-report.html")
 
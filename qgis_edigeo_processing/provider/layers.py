@@ -0,0 +1,148 @@
+import csv
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    Iterator,
+    Sequence,
+)
+from uuid import uuid4
+
+from osgeo import gdal
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsMemoryProviderUtils,
+    QgsProcessingException,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QDate, QDateTime, Qt, QVariant
+
+
+@contextmanager
+def flatgeobuf_source(name: str, data: bytes) -> Iterator[QgsVectorLayer]:
+    """Open FlatGeoBuf content as a vector layer
+
+    The content is read from a GDAL in-memory file, so nothing
+    is written to disk.
+    """
+    path = f"/vsimem/edigeo/{uuid4().hex}/{name}.fgb"
+    gdal.FileFromMemBuffer(path, data)
+    try:
+        source = QgsVectorLayer(path, name, "ogr")
+        if not source.isValid():
+            raise QgsProcessingException(f"Couche invalide {name}")
+        yield source
+    finally:
+        gdal.Unlink(path)
+
+
+def read_features(source: QgsVectorLayer) -> list[QgsFeature]:
+    return list(source.getFeatures())
+
+
+def transform_features(
+    features: Sequence[QgsFeature],
+    source_crs: QgsCoordinateReferenceSystem,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+):
+    """Reproject feature geometries in place"""
+    ct = QgsCoordinateTransform(source_crs, crs, transform_context)
+    for feature in features:
+        if not feature.hasGeometry():
+            continue
+        geom = feature.geometry()
+        if geom.transform(ct) != QgsGeometry.Success:
+            raise QgsProcessingException(f"Échec de la reprojection de l'objet {feature.id()}")
+        feature.setGeometry(geom)
+
+
+def memory_layer(
+    source: QgsVectorLayer,
+    features: Sequence[QgsFeature],
+    crs: QgsCoordinateReferenceSystem,
+) -> QgsVectorLayer:
+    """Create a memory layer with the fields of source
+
+    `features` must be in `crs`.
+    """
+    layer = QgsMemoryProviderUtils.createMemoryLayer(
+        source.name(),
+        source.fields(),
+        source.wkbType(),
+        crs,
+    )
+    # Add all features in one call
+    if not layer.dataProvider().addFeatures(list(features)):
+        raise QgsProcessingException(f"Échec du chargement de la couche {source.name()}")
+    layer.updateExtents()
+    return layer
+
+
+def write_flatgeobuf(
+    source: QgsVectorLayer,
+    features: Sequence[QgsFeature],
+    path: Path,
+    crs: QgsCoordinateReferenceSystem,
+    transform_context: QgsCoordinateTransformContext,
+):
+    """Write features as FlatGeoBuf with the fields of source
+
+    `features` must be in `crs`.
+    """
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "FlatGeobuf"
+
+    writer = QgsVectorFileWriter.create(
+        str(path),
+        source.fields(),
+        source.wkbType(),
+        crs,
+        transform_context,
+        options,
+    )
+    try:
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            raise QgsProcessingException(f"Échec de l'écriture de {path}: {writer.errorMessage()}")
+        if not writer.addFeatures(list(features)):
+            raise QgsProcessingException(f"Échec de l'écriture de {path}: {writer.errorMessage()}")
+    finally:
+        # Flush and close the file
+        del writer
+
+
+# Name of the EDIGEO identifier column in CSV exports
+CSV_ID = "edigeo_id"
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None or (isinstance(value, QVariant) and value.isNull()):
+        return ""
+    if isinstance(value, (QDate, QDateTime)):
+        return value.toString(Qt.DateFormat.ISODate)
+    return value
+
+
+def write_csv(source: QgsVectorLayer, ids: Sequence[str], path: Path):
+    """Write EDIGEO identifiers and attributes as CSV
+
+    `ids` are the EDIGEO identifiers of the source features, in order.
+    Geometries are not fetched.
+    """
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+
+    with path.open("w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow([CSV_ID, *source.fields().names()])
+        writer.writerows(
+            [rid, *(_csv_value(v) for v in feature.attributes())]
+            for rid, feature in zip(ids, source.getFeatures(request), strict=True)
+        )
@@ -0,0 +1,122 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Optional,
+    Sequence,
+)
+
+from edigeo.report import ValidationError
+from qgis.core import QgsGeometry
+
+from .cache import ValidationCache, wkb_key
+
+# Number of WKB geometries sent to a worker at once
+BATCH_SIZE = 256
+
+
+def is_geos_valid(wkb: bytes) -> bool:
+    geom = QgsGeometry()
+    geom.fromWkb(wkb)
+    return geom.isGeosValid()
+
+
+def _check_batch(batch: Sequence[tuple[bytes, bytes]]) -> list[tuple[bytes, bool]]:
+    return [(key, is_geos_valid(wkb)) for key, wkb in batch]
+
+
+class GeosValidator:
+    """Check GEOS validity of WKB geometries
+
+    With workers > 0, geometries are first submitted during a
+    preliminary pass and validated by batches in a thread pool.
+    `is_valid` then returns the precomputed results, so that errors
+    are still reported in order from the inspection callback and
+    the report does not depend on the number of workers.
+
+    If a cache is given, known results are reused and new results
+    are stored back in the cache.
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        batch_size: int = BATCH_SIZE,
+        cache: Optional[ValidationCache] = None,
+    ):
+        self._executor = ThreadPoolExecutor(workers) if workers > 0 else None
+        self._batch_size = batch_size
+        self._cache = cache
+        self._batch: list[tuple[bytes, bytes]] = []
+        self._submitted: set[bytes] = set()
+        self._futures: list[Future[list[tuple[bytes, bool]]]] = []
+        self._results: dict[bytes, bool] = {}
+
+    @property
+    def parallel(self) -> bool:
+        return self._executor is not None
+
+    def submit(self, wkb: bytes):
+        """Submit a geometry for validation in the thread pool"""
+        key = wkb_key(wkb)
+        if key in self._submitted or key in self._results:
+            return
+        valid = self._cache.get_validity(key) if self._cache else None
+        if valid is not None:
+            self._results[key] = valid
+            return
+        if self._executor is None:
+            return
+
+        self._submitted.add(key)
+        self._batch.append((key, wkb))
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._executor and self._batch:
+            self._futures.append(self._executor.submit(_check_batch, self._batch))
+            self._batch = []
+
+    def wait(self):
+        """Wait for submitted geometries"""
+        self._flush()
+        for future in self._futures:
+            for key, valid in future.result():
+                self._results[key] = valid
+                self._store(key, valid)
+        self._futures.clear()
+        self._submitted.clear()
+
+    def is_valid(self, wkb: bytes) -> bool:
+        key = wkb_key(wkb)
+        valid = self._results.get(key)
+        if valid is None and self._cache:
+            valid = self._cache.get_validity(key)
+        if valid is None:
+            valid = is_geos_valid(wkb)
+            self._store(key, valid)
+        return valid
+
+    def _store(self, key: bytes, valid: bool):
+        if self._cache:
+            self._cache.put_validity(key, valid)
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._results.clear()
+
+    def __enter__(self) -> "GeosValidator":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def invalid_error(rid: str) -> ValidationError:
+    return {
+        "rid": rid,
+        "face": "",
+        "status": "Invalid",
+        "arc": "",
+    }
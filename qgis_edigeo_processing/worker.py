@@ -0,0 +1,379 @@
+"""Worker daemon processing EDIGEO jobs from a spool directory
+
+Run with:
+
+    python -m qgis_edigeo_processing.worker <spool> [--workers N]
+
+Jobs are JSON files dropped in `<spool>/inbox`:
+
+    {"algorithm": "edigeo:export", "parameters": {"file": ..., "folder": ...}}
+
+Producers must create job files atomically (i.e write to a temporary
+name not ending with `.json`, then rename).
+
+Several daemons may share a spool: each daemon claims jobs by moving
+them to its own `<spool>/running/<host>-<pid>` folder.
+
+Each job is run on a pool of worker processes that initialize QGIS and
+the processing provider only once. Outputs are written to a staging
+location and moved to their destination on success, then a status file
+is written atomically in `<spool>/done` or `<spool>/failed`.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from qgis.core import (
+    QgsApplication,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingParameterFolderDestination,
+)
+
+from .provider import Provider
+
+INBOX = "inbox"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_ALGORITHM = "edigeo:export"
+
+# Keep references to the application and the provider
+_app: Optional[QgsApplication] = None
+_provider: Optional[Provider] = None
+
+
+def write_atomic(path: Path, content: str):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(content)
+    os.replace(tmp, path)
+
+
+def _init_worker():
+    global _app, _provider
+    _app = QgsApplication([], False)
+    _app.initQgis()
+    _provider = Provider()
+    QgsApplication.processingRegistry().addProvider(_provider)
+
+
+def _stage_outputs(
+    alg: QgsProcessingAlgorithm,
+    parameters: dict[str, Any],
+    job_id: str,
+) -> list[tuple[Path, Path]]:
+    """Redirect destination parameters to staging locations"""
+    staged = []
+    for p in alg.destinationParameterDefinitions():
+        value = parameters.get(p.name())
+        if not value or not isinstance(value, str):
+            continue
+        target = Path(value)
+        staging = target.parent.joinpath(f".{target.name}.{job_id}.tmp")
+        if isinstance(p, QgsProcessingParameterFolderDestination):
+            staging.mkdir(parents=True, exist_ok=True)
+        else:
+            staging.parent.mkdir(parents=True, exist_ok=True)
+        parameters[p.name()] = str(staging)
+        staged.append((staging, target))
+    return staged
+
+
+def _commit_outputs(staged: list[tuple[Path, Path]]):
+    """Move staged outputs to their destination"""
+    for staging, target in staged:
+        if staging.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            for path in staging.iterdir():
+                os.replace(path, target.joinpath(path.name))
+            staging.rmdir()
+        elif staging.exists():
+            os.replace(staging, target)
+
+
+def _remove_staged(staged: list[tuple[Path, Path]]):
+    for staging, _ in staged:
+        if staging.is_dir():
+            shutil.rmtree(staging, ignore_errors=True)
+        else:
+            staging.unlink(missing_ok=True)
+
+
+def _unstage(value: Any, staged: list[tuple[Path, Path]]) -> Any:
+    """Replace staging locations by their destination in results"""
+    if isinstance(value, list):
+        return [_unstage(v, staged) for v in value]
+    if isinstance(value, str):
+        for staging, target in staged:
+            if value.startswith(str(staging)):
+                return str(target) + value[len(str(staging)) :]
+    return value
+
+
+def run_job(job: Path, spool: Path) -> bool:
+    """Run a job from the `running` folder and write its status"""
+    start = time.perf_counter()
+    status: dict[str, Any] = {"job": job.stem}
+    feedback = QgsProcessingFeedback()
+    staged: list[tuple[Path, Path]] = []
+    ok = False
+    try:
+        spec = json.loads(job.read_text())
+        status["algorithm"] = spec.get("algorithm", DEFAULT_ALGORITHM)
+        alg = QgsApplication.processingRegistry().createAlgorithmById(status["algorithm"])
+        if alg is None:
+            raise ValueError(f"Unknown algorithm {status['algorithm']}")
+
+        parameters = dict(spec.get("parameters", {}))
+        staged = _stage_outputs(alg, parameters, job.stem)
+
+        results, ok = alg.run(parameters, QgsProcessingContext(), feedback)
+        if ok:
+            _commit_outputs(staged)
+            status["results"] = {k: _unstage(v, staged) for k, v in results.items()}
+    except Exception as err:
+        status["error"] = str(err)
+
+    if not ok:
+        _remove_staged(staged)
+
+    status["status"] = "ok" if ok else "error"
+    status["elapsed"] = round(time.perf_counter() - start, 3)
+    status["log"] = feedback.textLog()
+
+    write_atomic(spool.joinpath(DONE if ok else FAILED, job.name), json.dumps(status))
+    job.unlink(missing_ok=True)
+    return ok
+
+
+def daemon_id(host: str, pid: int) -> str:
+    return f"{host}-{pid}"
+
+
+def parse_daemon_id(name: str) -> Optional[tuple[str, int]]:
+    host, _, pid = name.rpartition("-")
+    if not host or not pid.isdigit():
+        return None
+    return host, int(pid)
+
+
+def is_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill() would terminate the process
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Owned by another user
+        return True
+    return True
+
+
+class Daemon:
+    """Dispatch spooled jobs to a bounded pool of warm workers
+
+    If a worker process dies (i.e on a native crash), the pool is rebuilt
+    and the jobs that were in flight are requeued as suspects. Suspects
+    are then run one at a time, so that only the job crashing the worker
+    is failed.
+    """
+
+    # Function running a job in a worker process
+    runner: Callable[[Path, Path], bool] = staticmethod(run_job)
+
+    def __init__(self, spool: Path, workers: int, interval: float = 1.0):
+        self._spool = spool
+        self._workers = workers
+        self._interval = interval
+        for folder in (INBOX, RUNNING, DONE, FAILED):
+            spool.joinpath(folder).mkdir(parents=True, exist_ok=True)
+        # Jobs claimed by this daemon
+        self._claimed = spool.joinpath(RUNNING, daemon_id(socket.gethostname(), os.getpid()))
+        self._running: dict[Future[bool], Path] = {}
+        self._suspects: set[str] = set()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _requeue(self):
+        """Requeue jobs left running by dead daemons on this host"""
+        host = socket.gethostname()
+        for folder in self._spool.joinpath(RUNNING).iterdir():
+            owner = parse_daemon_id(folder.name)
+            if not folder.is_dir() or owner is None:
+                continue
+            owner_host, owner_pid = owner
+            # Daemons on other hosts cannot be checked.
+            # A folder with our own pid belongs to a dead daemon
+            # whose pid has been reused
+            if owner_host != host or (owner_pid != os.getpid() and is_alive(owner_pid)):
+                continue
+            for job in folder.glob("*.json"):
+                self._requeue_job(job)
+            with suppress(OSError):
+                folder.rmdir()
+
+    def _requeue_job(self, job: Path):
+        # The job may have completed before its worker died
+        with suppress(FileNotFoundError):
+            os.replace(job, self._spool.joinpath(INBOX, job.name))
+
+    def _fail(self, job: Path, error: str):
+        logging.error("Job %s: %s", job.stem, error)
+        write_atomic(
+            self._spool.joinpath(FAILED, job.name),
+            json.dumps({"job": job.stem, "status": "error", "error": error}),
+        )
+        job.unlink(missing_ok=True)
+
+    def _claim(self) -> Optional[Path]:
+        if any(job.name in self._suspects for job in self._running.values()):
+            # A suspect is running alone
+            return None
+
+        inbox = sorted(self._spool.joinpath(INBOX).glob("*.json"))
+        suspects = [job for job in inbox if job.name in self._suspects]
+        if suspects:
+            # Wait for running jobs before running suspects alone
+            if self._running:
+                return None
+            inbox = suspects
+
+        for job in inbox:
+            running = self._claimed.joinpath(job.name)
+            try:
+                os.replace(job, running)
+            except FileNotFoundError:
+                # Claimed by another daemon
+                continue
+            return running
+        return None
+
+    def _reap(self) -> list[Path]:
+        """Collect finished jobs, return the jobs lost with a broken pool"""
+        lost = []
+        for future in [f for f in self._running if f.done()]:
+            job = self._running.pop(future)
+            if future.cancelled():
+                # Left in the running folder, requeued on next start
+                continue
+            err = future.exception()
+            if isinstance(err, BrokenProcessPool):
+                lost.append(job)
+                continue
+            if err is not None:
+                self._fail(job, str(err))
+            else:
+                logging.info("Job %s: %s", job.stem, "done" if future.result() else "failed")
+            self._suspects.discard(job.name)
+        return lost
+
+    def _recover(self, lost: list[Path]):
+        """Rebuild the pool after a worker died"""
+        # All jobs in flight are lost with the pool
+        wait(list(self._running))
+        lost.extend(self._reap())
+
+        if len(lost) == 1:
+            # The only job that did not complete crashed the worker
+            job = lost[0]
+            self._suspects.discard(job.name)
+            if job.exists():
+                self._fail(job, "Worker process died")
+        else:
+            logging.warning("Worker process died, requeuing %d jobs", len(lost))
+            for job in lost:
+                self._suspects.add(job.name)
+                self._requeue_job(job)
+
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self._executor = self._new_executor()
+
+    def run(self, once: bool = False):
+        self._requeue()
+        self._claimed.mkdir(exist_ok=True)
+        self._executor = self._new_executor()
+        try:
+            while True:
+                lost = self._reap()
+                if lost:
+                    self._recover(lost)
+                # Keep at most one pending job per worker
+                while len(self._running) < 2 * self._workers:
+                    job = self._claim()
+                    if job is None:
+                        break
+                    try:
+                        future = self._executor.submit(self.runner, job, self._spool)
+                    except BrokenProcessPool:
+                        self._requeue_job(job)
+                        self._recover([])
+                        break
+                    logging.info("Job %s: started", job.stem)
+                    self._running[future] = job
+                if once and not self._running:
+                    break
+                time.sleep(self._interval)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._reap()
+            # Cancelled jobs are left to be requeued on next start
+            with suppress(OSError):
+                self._claimed.rmdir()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EDIGEO processing worker")
+    parser.add_argument("spool", type=Path, help="Spool directory")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Inbox polling interval in seconds",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Exit when the inbox is empty",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    Daemon(args.spool, max(args.workers, 1), args.interval).run(args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,53 @@ def test_html_report(plugin: Any, data: Path, output_dir: Path):
         print("\n::test_inspect::", f.read())
 
 
+def test_html_report_workers(plugin: Any, data: Path, output_dir: Path):
+    # Parallel validation must produce the same report as serial validation
+    from qgis import processing
+
+    def run(folder: Path, workers: int) -> str:
+        folder.mkdir(exist_ok=True)
+        result = processing.run(
+            "edigeo:inspect",
+            {
+                "file": str(data.joinpath("75103000AO01", "E000AO01.THF")),
+                "folder": str(folder),
+                "workers": workers,
+            },
+        )
+        return Path(result.get("html")).read_text()
+
+    serial = run(output_dir.joinpath("serial"), 0)
+    parallel = run(output_dir.joinpath("parallel"), 4)
+    assert serial == parallel
+
+
+def test_geos_validator(plugin: Any):
+    # Parallel validation must give the same results as serial validation
+    from qgis.core import QgsGeometry
+
+    from qgis_edigeo_processing.provider.validity import GeosValidator
+
+    valid = bytes(QgsGeometry.fromWkt("POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))").asWkb())
+    # Self-intersecting (bow-tie) polygon
+    invalid = bytes(QgsGeometry.fromWkt("POLYGON((0 0, 1 1, 1 0, 0 1, 0 0))").asWkb())
+
+    geometries = [invalid if i % 2 or i == 12 else valid for i in range(13)]
+
+    def run(workers: int) -> list[bool]:
+        with GeosValidator(workers, batch_size=2) as validator:
+            if validator.parallel:
+                for wkb in geometries:
+                    validator.submit(wkb)
+                validator.wait()
+            return [validator.is_valid(wkb) for wkb in geometries]
+
+    serial = run(0)
+    assert serial == [wkb is valid for wkb in geometries]
+    assert run(1) == serial
+    assert run(3) == serial
+
+
 def test_export(plugin: Any, data: Path, output_dir: Path):
     # Test HTML reporting
     from qgis import processing
@@ -74,3 +121,441 @@ def test_export(plugin: Any, data: Path, output_dir: Path):
         path = Path(layer)
         assert path.exists()
         assert path.is_relative_to(output_dir)
+
+
+def test_export_cache(plugin: Any, data: Path, tmp_path: Path):
+    # Second run must reuse cached validation results
+    # and produce the same output
+    import sqlite3
+    import time
+
+    from qgis import processing
+
+    cache_dir = tmp_path.joinpath("cache")
+    cache_dir.mkdir()
+
+    def run(folder: Path) -> dict[str, bytes]:
+        folder.mkdir()
+        result = processing.run(
+            "edigeo:export",
+            {
+                "file": str(data.joinpath("75103000AO01", "E000AO01.THF")),
+                "folder": str(folder),
+                "add": False,
+                "cache": str(cache_dir),
+            },
+        )
+        return {Path(layer).name: Path(layer).read_bytes() for layer in result.get("layers")}
+
+    def entries() -> list[float]:
+        with sqlite3.connect(cache_dir.joinpath("validation.sqlite")) as conn:
+            return [atime for (atime,) in conn.execute("SELECT atime FROM results")]
+
+    first = run(tmp_path.joinpath("nocache"))
+    stored = entries()
+    assert len(stored) > 0
+
+    start = time.time()
+    second = run(tmp_path.joinpath("cached"))
+    assert first == second
+
+    # No new results, and every stored result was read on the second run
+    hits = entries()
+    assert len(hits) == len(stored)
+    assert all(atime >= start for atime in hits)
+
+
+def test_export_archive_cache(plugin: Any, data: Path, tmp_path: Path):
+    # Archives are decompressed once in the cache
+    import tarfile
+
+    from qgis import processing
+
+    archive = tmp_path.joinpath("75103000AO01.tar.bz2")
+    with tarfile.open(archive, "w:bz2") as tar:
+        tar.add(data.joinpath("75103000AO01"), arcname="75103000AO01")
+
+    cache_dir = tmp_path.joinpath("cache")
+    cache_dir.mkdir()
+
+    for _ in range(2):
+        folder = tmp_path.joinpath("archive")
+        folder.mkdir(exist_ok=True)
+        result = processing.run(
+            "edigeo:export",
+            {
+                "file": str(archive),
+                "folder": str(folder),
+                "add": False,
+                "cache": str(cache_dir),
+            },
+        )
+        assert len(result.get("layers")) > 0
+
+    exchanges = list(cache_dir.joinpath("exchanges").iterdir())
+    assert len(exchanges) == 1
+
+
+def test_exchange_cache_eviction(plugin: Any, data: Path, tmp_path: Path):
+    # Recently used exchanges are not evicted
+    import os
+    import tarfile
+    import time
+
+    from qgis_edigeo_processing.provider.archive import EVICTION_DELAY, ExchangeCache
+
+    archive = tmp_path.joinpath("75103000AO01.tar.bz2")
+    with tarfile.open(archive, "w:bz2") as tar:
+        tar.add(data.joinpath("75103000AO01"), arcname="75103000AO01")
+
+    folder = tmp_path.joinpath("exchanges")
+    folder.mkdir()
+    for name in ("stale", "recent"):
+        folder.joinpath(name).mkdir()
+        folder.joinpath(name, "E000AO01.THF").write_bytes(b"x" * 1024)
+    past = time.time() - 2 * EVICTION_DELAY
+    os.utime(folder.joinpath("stale"), (past, past))
+
+    cache = ExchangeCache(folder, max_size=1)
+    thf = cache.get(archive, QgsProcessingFeedback())
+    assert thf.is_file()
+
+    assert not folder.joinpath("stale").exists()
+    assert folder.joinpath("recent").is_dir()
+
+
+def test_catalog(plugin: Any, data: Path, tmp_path: Path):
+    import json
+    import shutil
+
+    from qgis import processing
+    from qgis.core import QgsVectorLayer
+
+    folder = tmp_path.joinpath("data")
+    shutil.copytree(data.joinpath("75103000AO01"), folder.joinpath("75103000AO01"))
+
+    output = tmp_path.joinpath("catalog.json")
+
+    result = processing.run(
+        "edigeo:catalog",
+        {
+            "folder": str(folder),
+            "output": str(output),
+        },
+    )
+
+    with Path(result.get("output")).open() as f:
+        catalog = json.load(f)
+
+    print("\n::test_catalog::", catalog)
+    assert len(catalog) == 1
+
+    entry = catalog[0]
+    assert entry["file"] == "75103000AO01/E000AO01.THF"
+    assert entry["size"] == sum(p.stat().st_size for p in folder.joinpath("75103000AO01").iterdir())
+    assert entry["crs"]
+    assert len(entry["extent"]) == 4
+    xmin, ymin, xmax, ymax = entry["extent"]
+    assert xmin < xmax
+    assert ymin < ymax
+
+    layers = {layer["name"]: layer["count"] for layer in entry["layers"]}
+    assert len(layers) > 0
+    assert entry["features"] == sum(layers.values())
+
+    # Feature counts must match the exported layers
+    exported = tmp_path.joinpath("export")
+    exported.mkdir()
+    result = processing.run(
+        "edigeo:export",
+        {
+            "file": str(folder.joinpath("75103000AO01", "E000AO01.THF")),
+            "folder": str(exported),
+            "add": False,
+        },
+    )
+    counts = {}
+    for path in result.get("layers"):
+        layer = QgsVectorLayer(path, Path(path).stem, "ogr")
+        counts[Path(path).stem] = layer.featureCount()
+    assert counts == layers
+
+
+def test_export_memory(plugin: Any, data: Path, output_dir: Path):
+    # Layers are built in memory without writing to disk
+    from qgis import processing
+    from qgis.core import QgsProcessingUtils
+
+    context = QgsProcessingContext()
+    context.setTemporaryFolder(str(output_dir))
+
+    result = processing.run(
+        "edigeo:export",
+        {
+            "file": str(data.joinpath("75103000AO01", "E000AO01.THF")),
+            "memory": True,
+            "add": False,
+        },
+        context=context,
+    )
+
+    outputs = result.get("layers")
+    assert len(outputs) > 0
+    for layer_id in outputs:
+        layer = QgsProcessingUtils.mapLayerFromString(layer_id, context)
+        assert layer is not None
+        assert layer.providerType() == "memory"
+        assert layer.featureCount() > 0
+
+
+def test_export_reproject(plugin: Any, data: Path, tmp_path: Path):
+    # Layers are reprojected while exporting
+    import time
+
+    from qgis import processing
+    from qgis.core import (
+        QgsCoordinateReferenceSystem,
+        QgsCoordinateTransform,
+        QgsProject,
+        QgsVectorLayer,
+    )
+
+    def export(name: str, **parameters) -> tuple[list[str], float]:
+        start = time.perf_counter()
+        result = processing.run(
+            "edigeo:export",
+            {
+                "file": str(data.joinpath("75103000AO01", "E000AO01.THF")),
+                "folder": str(tmp_path.joinpath(name)),
+                "add": False,
+                **parameters,
+            },
+        )
+        return result.get("layers"), time.perf_counter() - start
+
+    plain, plain_time = export("plain")
+    reprojected, reproject_time = export("reproject", crs="EPSG:4326")
+    print(
+        "\n::test_export_reproject::plain",
+        f"{plain_time:.3f}s",
+        "reprojected",
+        f"{reproject_time:.3f}s",
+    )
+
+    assert len(plain) > 0
+    assert [Path(p).name for p in reprojected] == [Path(p).name for p in plain]
+
+    target = QgsCoordinateReferenceSystem("EPSG:4326")
+    for plain_path, path in zip(plain, reprojected):
+        source = QgsVectorLayer(plain_path, Path(plain_path).stem, "ogr")
+        layer = QgsVectorLayer(path, Path(path).stem, "ogr")
+        assert layer.isValid()
+        assert layer.crs().authid() == "EPSG:4326"
+        assert layer.featureCount() == source.featureCount()
+        assert source.crs() != target
+
+        # Coordinates are actually transformed
+        ct = QgsCoordinateTransform(source.crs(), target, QgsProject.instance())
+        expected = ct.transformBoundingBox(source.extent())
+        assert not layer.extent().intersects(source.extent())
+        assert abs(layer.extent().xMinimum() - expected.xMinimum()) < 1e-4
+        assert abs(layer.extent().yMinimum() - expected.yMinimum()) < 1e-4
+
+        # Feature order may change with the spatial index
+        dst = next(layer.getFeatures()).geometry().vertexAt(0)
+        vertices = (f.geometry().vertexAt(0) for f in source.getFeatures())
+        points = (ct.transform(v.x(), v.y()) for v in vertices)
+        assert any(abs(dst.x() - p.x()) < 1e-7 and abs(dst.y() - p.y()) < 1e-7 for p in points)
+
+
+def test_worker_job(plugin: Any, data: Path, output_dir: Path):
+    # Run a spooled job in the current process
+    import json
+
+    from qgis_edigeo_processing.worker import run_job
+
+    spool = output_dir.joinpath("spool")
+    for folder in ("running", "done", "failed"):
+        spool.joinpath(folder).mkdir(parents=True, exist_ok=True)
+
+    folder = output_dir.joinpath("worker")
+    job = spool.joinpath("running", "job1.json")
+    job.write_text(
+        json.dumps(
+            {
+                "algorithm": "edigeo:export",
+                "parameters": {
+                    "file": str(data.joinpath("75103000AO01", "E000AO01.THF")),
+                    "folder": str(folder),
+                },
+            }
+        )
+    )
+
+    assert run_job(job, spool)
+    assert not job.exists()
+
+    status = json.loads(spool.joinpath("done", "job1.json").read_text())
+    print("\n::test_worker_job::", status["results"])
+    assert status["status"] == "ok"
+    for layer in status["results"]["layers"]:
+        path = Path(layer)
+        assert path.exists()
+        assert path.parent == folder
+
+
+def _crash_or_run_job(job: Path, spool: Path) -> bool:
+    # Simulate a native crash of the worker process
+    import os
+
+    from qgis_edigeo_processing.worker import run_job
+
+    if job.stem.startswith("crash"):
+        os._exit(1)
+    return run_job(job, spool)
+
+
+def test_worker_daemon(plugin: Any, data: Path, tmp_path: Path):
+    # Run spooled jobs on the worker pool, a crashing job must
+    # not fail the other jobs
+    import json
+
+    from qgis_edigeo_processing.worker import Daemon
+
+    class CrashDaemon(Daemon):
+        runner = staticmethod(_crash_or_run_job)
+
+    spool = tmp_path.joinpath("spool")
+    inbox = spool.joinpath("inbox")
+    inbox.mkdir(parents=True)
+
+    thf = str(data.joinpath("75103000AO01", "E000AO01.THF"))
+    jobs = {
+        "crash": {"parameters": {"file": thf, "folder": str(tmp_path.joinpath("crash"))}},
+        "job1": {"parameters": {"file": thf, "folder": str(tmp_path.joinpath("job1"))}},
+        "job2": {"parameters": {"file": thf, "folder": str(tmp_path.joinpath("job2"))}},
+        "unknown": {"algorithm": "edigeo:unknown", "parameters": {}},
+    }
+    for name, job in jobs.items():
+        inbox.joinpath(f"{name}.json").write_text(json.dumps(job))
+
+    CrashDaemon(spool, workers=2, interval=0.1).run(once=True)
+
+    assert list(inbox.iterdir()) == []
+    assert list(spool.joinpath("running").iterdir()) == []
+
+    for name in ("job1", "job2"):
+        status = json.loads(spool.joinpath("done", f"{name}.json").read_text())
+        assert status["status"] == "ok"
+        for layer in status["results"]["layers"]:
+            assert Path(layer).parent == tmp_path.joinpath(name)
+            assert Path(layer).exists()
+
+    for name in ("crash", "unknown"):
+        status = json.loads(spool.joinpath("failed", f"{name}.json").read_text())
+        assert status["status"] == "error"
+    assert sorted(p.name for p in spool.joinpath("failed").iterdir()) == ["crash.json", "unknown.json"]
+
+
+def test_worker_requeue(plugin: Any, tmp_path: Path):
+    # Only jobs of dead daemons on this host are requeued
+    import os
+    import socket
+    import subprocess
+    import sys
+
+    from qgis_edigeo_processing.worker import Daemon, daemon_id
+
+    spool = tmp_path.joinpath("spool")
+    running = spool.joinpath("running")
+
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+
+    host = socket.gethostname()
+    owners = {
+        "dead": daemon_id(host, proc.pid),
+        "alive": daemon_id(host, os.getppid()),
+        "remote": daemon_id(f"{host}.remote", proc.pid),
+    }
+    for name, owner in owners.items():
+        running.joinpath(owner).mkdir(parents=True)
+        running.joinpath(owner, f"{name}.json").write_text("{}")
+
+    Daemon(spool, workers=1)._requeue()
+
+    assert [p.name for p in spool.joinpath("inbox").iterdir()] == ["dead.json"]
+    assert not running.joinpath(owners["dead"]).exists()
+    assert running.joinpath(owners["alive"], "alive.json").exists()
+    assert running.joinpath(owners["remote"], "remote.json").exists()
+
+
+def test_export_attributes(plugin: Any, data: Path, tmp_path: Path):
+    # Export attributes only as CSV
+    import csv
+
+    import pytest
+
+    from qgis import processing
+    from qgis.core import QgsProcessingException, QgsVectorLayer
+
+    thf = str(data.joinpath("75103000AO01", "E000AO01.THF"))
+
+    folder = tmp_path.joinpath("attributes")
+    folder.mkdir()
+
+    result = processing.run(
+        "edigeo:export",
+        {
+            "file": thf,
+            "folder": str(folder),
+            "add": False,
+            "attributes": True,
+        },
+    )
+    outputs = result.get("layers")
+    assert len(outputs) > 0
+
+    # Reference layers from the full export
+    reference = tmp_path.joinpath("reference")
+    reference.mkdir()
+    result = processing.run(
+        "edigeo:export",
+        {
+            "file": thf,
+            "folder": str(reference),
+            "add": False,
+        },
+    )
+    assert len(result.get("layers")) == len(outputs)
+
+    for layer in outputs:
+        path = Path(layer)
+        assert path.suffix == ".csv"
+        with path.open(encoding="utf-8") as f:
+            header, *rows = list(csv.reader(f))
+
+        expected = QgsVectorLayer(str(reference.joinpath(path.stem).with_suffix(".fgb")), path.stem, "ogr")
+        assert expected.isValid()
+        assert header == ["edigeo_id", *expected.fields().names()]
+        assert len(rows) == expected.featureCount()
+
+        # EDIGEO identifiers, not row numbers
+        ids = [row[0] for row in rows]
+        assert len(set(ids)) == len(ids)
+        assert ids != [str(i) for i in range(len(ids))]
+        assert all(ids)
+
+    # Incompatible options
+    for option in ({"memory": True}, {"crs": "EPSG:2154"}):
+        with pytest.raises(QgsProcessingException):
+            processing.run(
+                "edigeo:export",
+                {
+                    "file": thf,
+                    "folder": str(folder),
+                    "add": False,
+                    "attributes": True,
+                    **option,
+                },
+            )